@@ -14,12 +14,29 @@ License: CC0 1.0 Universal
 
 import re
 import os
+import mmap
+import shutil
+import stat
 import sys
+import tempfile
+import threading
 import argparse
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List
+from typing import AnyStr, BinaryIO, Callable, ClassVar, Iterator, Optional, List, Pattern, Tuple
 import logging
 
+try:
+    # Optional: Google's RE2 runs the block pattern as a DFA, in linear time
+    # with no backtracking. The pattern only uses features RE2 supports
+    # (literals, the inline (?s) flag and a lazy .*?), so both engines
+    # match the same blocks
+    import re2 as _block_re
+except ImportError:
+    _block_re = re
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,6 +46,55 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _temp_file_for(path: Path) -> BinaryIO:
+    """
+    Create a uniquely named temporary file next to the given file.
+    
+    Keeping it in the same directory guarantees os.replace can swap it in
+    atomically, since both names live on the same filesystem. If that
+    directory cannot be written to, the system temporary directory is used
+    instead and the caller has to copy the content back.
+    
+    Args:
+        path (Path): File that the temporary file will eventually replace
+        
+    Returns:
+        BinaryIO: Temporary file opened for binary writing, not deleted on close
+    """
+    try:
+        return tempfile.NamedTemporaryFile(
+            'wb', dir=path.parent, prefix=path.name + '.', suffix='.tmp', delete=False
+        )
+    except PermissionError:
+        return tempfile.NamedTemporaryFile(
+            'wb', prefix=path.name + '.', suffix='.tmp', delete=False
+        )
+
+
+# Per-thread read buffer, reused from one file to the next
+_thread_local = threading.local()
+
+
+def _thread_buffer(size: int) -> bytearray:
+    """
+    Return this thread's reusable read buffer, grown to at least ``size``.
+    
+    Buffers are per thread so that clean_multiple_files' workers never
+    share one, and per process since each worker process imports the
+    module afresh or forks with its own copy.
+    
+    Args:
+        size (int): Minimum number of bytes needed
+        
+    Returns:
+        bytearray: Buffer of at least ``size`` bytes; its contents are stale
+    """
+    buf = getattr(_thread_local, 'buffer', None)
+    if buf is None or len(buf) < size:
+        buf = _thread_local.buffer = bytearray(size)
+    return buf
+
+
 class ContentCleaner:
     """
     A class to handle cleaning of C test files by removing specific content blocks.
@@ -37,11 +103,34 @@ class ContentCleaner:
     import failure sections while preserving file structure and formatting.
     """
     
+    # Only the size limits vary per instance; without a per-instance
+    # __dict__ each cleaner is a small fixed-size object
+    __slots__ = ("stream_threshold", "chunk_size")
+    
+    start_pattern: ClassVar[str] = r"TEST\.IMPORT_FAILURES:"
+    end_pattern: ClassVar[str] = r"TEST\.END_IMPORT_FAILURES:"
+    # The inline (?s) flag lets '.' match newlines, which compiles to a single
+    # any-character opcode instead of the two-category [\s\S] class test, and
+    # keeps the pattern usable on its own without passing flags
+    full_pattern: ClassVar[str] = rf"(?s){start_pattern}.*?{end_pattern}"
+    
+    # Compiled once when the class is created and shared by every instance,
+    # thread and worker process; compiled patterns are immutable. Uses RE2
+    # when google-re2 is installed
+    _FULL_RE: ClassVar[Pattern[str]] = _block_re.compile(full_pattern)
+    
+    # Literal markers used by the substring scanner
+    start_marker: ClassVar[str] = "TEST.IMPORT_FAILURES:"
+    end_marker: ClassVar[str] = "TEST.END_IMPORT_FAILURES:"
+    _start_marker_bytes: ClassVar[bytes] = start_marker.encode('ascii')
+    _end_marker_bytes: ClassVar[bytes] = end_marker.encode('ascii')
+    
     def __init__(self):
-        """Initialize the ContentCleaner with default patterns."""
-        self.start_pattern = r"TEST\.IMPORT_FAILURES:"
-        self.end_pattern = r"TEST\.END_IMPORT_FAILURES:"
-        self.full_pattern = rf"{self.start_pattern}[\s\S]*?{self.end_pattern}"
+        """Initialize the ContentCleaner with default size limits."""
+        # Files at least this large are cleaned in fixed-size chunks
+        # instead of being mapped and rebuilt in memory
+        self.stream_threshold = 64 * 1024 * 1024
+        self.chunk_size = 1024 * 1024
         
     def clean_content(self, content: str) -> str:
         """
@@ -59,134 +148,638 @@ class ContentCleaner:
             >>> cleaner.clean_content(content)
             'some code\\nmore code'
         """
-        try:
-            # Remove the content blocks while preserving surrounding structure
-            cleaned = re.sub(self.full_pattern, "", content, flags=re.MULTILINE | re.DOTALL)
+        cleaned, block_count = self._remove_blocks(content)
+        if block_count == 0:
+            return content
+        
+        # Clean up any excessive whitespace that might result
+        return self._collapse_blank_lines(cleaned)
+    
+    def _collapse_blank_lines(self, content: AnyStr) -> AnyStr:
+        """
+        Collapse runs of blank lines into a single blank line.
+        
+        Two or more consecutive whitespace-only lines are replaced by one
+        empty line, which ends in CR if the line before the run does so
+        that CRLF files stay consistent. This is equivalent to substituting
+        ``(\\r?)\\n\\s*\\n\\s*\\n`` with ``\\1\\n\\1\\n``, but a single split and
+        one pass over the lines avoids the regex engine backtracking over
+        every whitespace run.
+        
+        Args:
+            content (AnyStr): Text or raw file content
             
-            # Clean up any excessive whitespace that might result
-            cleaned = re.sub(r'\n\s*\n\s*\n', '\n\n', cleaned)
+        Returns:
+            AnyStr: Content with excessive blank lines removed
+        """
+        if isinstance(content, str):
+            newline, cr = "\n", "\r"
+        else:
+            newline, cr = b"\n", b"\r"
+        
+        lines = content.split(newline)
+        if len(lines) < 4:
+            # A run needs two blank lines between two others
+            return content
+        
+        out = [lines[0]]
+        run = 0
+        first_blank = None
+        
+        # The first and last lines are never inside a run
+        for line in itertools.islice(lines, 1, len(lines) - 1):
+            # isspace() tests the line in place where strip() would copy it
+            if line and not line.isspace():
+                if run:
+                    out.append(first_blank if run == 1 else self._blank_line(out[-1], cr))
+                    run = 0
+                out.append(line)
+            else:
+                if not run:
+                    first_blank = line
+                run += 1
+        
+        if run:
+            out.append(first_blank if run == 1 else self._blank_line(out[-1], cr))
+        out.append(lines[-1])
+        
+        return newline.join(out)
+    
+    @staticmethod
+    def _blank_line(previous: AnyStr, cr: AnyStr) -> AnyStr:
+        """Return the empty line that replaces a run, matching the previous line ending."""
+        return cr if previous.endswith(cr) else cr[:0]
+    
+    def _remove_blocks(self, content: AnyStr) -> Tuple[AnyStr, int]:
+        """
+        Remove import failure blocks and count them in a single pass.
+        
+        Args:
+            content (AnyStr): Text or raw file content to clean
             
-            return cleaned
+        Returns:
+            Tuple[AnyStr, int]: Content with blocks removed and number of blocks removed
+        """
+        spans = self._find_blocks(content)
+        if not spans:
+            return content, 0
+        
+        return content[:0].join(self._kept_segments(content, spans)), len(spans)
+    
+    def _kept_segments(self, content: AnyStr, spans: List[Tuple[int, int]],
+                       length: Optional[int] = None) -> Iterator[AnyStr]:
+        """
+        Yield the content between the removed blocks, one slice at a time.
+        
+        Args:
+            content (AnyStr): Text or raw file content
+            spans (List[Tuple[int, int]]): Blocks found by _find_blocks
+            length (Optional[int]): Number of valid leading bytes when content
+                is a reused buffer; defaults to all of it
             
-        except re.error as e:
-            logger.error(f"Regex error during content cleaning: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Unexpected error during content cleaning: {e}")
-            raise
+        Yields:
+            AnyStr: Each piece of content that is kept
+        """
+        pos = 0
+        for start, end in spans:
+            yield content[pos:start]
+            pos = end
+        yield content[pos:length]
     
-    def validate_file(self, file_path: Path) -> bool:
+    def _write_kept(self, content: bytes, spans: List[Tuple[int, int]],
+                    length: Optional[int], write: Callable[[bytes], object]) -> int:
         """
-        Validate that the file exists and is readable.
+        Pass the content between the removed blocks to ``write``.
         
         Args:
-            file_path (Path): Path to the file to validate
+            content (bytes): Raw file content, possibly an mmap or a reused buffer
+            spans (List[Tuple[int, int]]): Blocks found by _find_blocks
+            length (Optional[int]): Number of valid leading bytes in content
+            write (Callable[[bytes], object]): Receives the kept content
             
         Returns:
-            bool: True if file is valid, False otherwise
+            int: Number of blocks removed
         """
-        if not file_path.exists():
-            logger.error(f"File does not exist: {file_path}")
-            return False
-            
-        if not file_path.is_file():
-            logger.error(f"Path is not a file: {file_path}")
-            return False
+        for segment in self._kept_segments(content, spans, length):
+            write(segment)
+        return len(spans)
+    
+    def _find_blocks(self, content: AnyStr, length: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Locate import failure blocks using plain substring searches.
+        
+        This matches exactly what full_pattern matches: each block runs from a
+        start marker to the first end marker after it. A start marker without
+        a closing end marker is left in place. Because both markers are fixed
+        literals, str.find does the scanning and no regex backtracking is
+        involved.
+        
+        Args:
+            content (AnyStr): Text or raw file content to analyze
+            length (Optional[int]): Number of valid leading bytes when content
+                is a reused buffer; defaults to all of it
             
-        if not os.access(file_path, os.R_OK | os.W_OK):
-            logger.error(f"File is not readable/writable: {file_path}")
-            return False
+        Returns:
+            List[Tuple[int, int]]: (start, end) offsets of each block
+        """
+        if length is None:
+            length = len(content)
+        
+        if isinstance(content, str):
+            start_marker, end_marker = self.start_marker, self.end_marker
+        else:
+            start_marker, end_marker = self._start_marker_bytes, self._end_marker_bytes
+        
+        spans = []
+        pos = 0
+        while True:
+            start = content.find(start_marker, pos, length)
+            if start < 0:
+                break
+            end = content.find(end_marker, start + len(start_marker), length)
+            if end < 0:
+                # No later start marker can be closed either
+                break
+            pos = end + len(end_marker)
+            spans.append((start, pos))
+        
+        return spans
+    
+    def _search_limit(self, content: str) -> int:
+        """
+        Find where a regex search for blocks can safely stop.
+        
+        No block can extend past the last end marker. A start marker after
+        it can never be closed, but the lazy pattern would still scan to the
+        end of the content for every such marker before giving up. Stopping
+        the search at the last end marker makes every attempt that gets past
+        the start marker succeed, so the total work stays linear in the
+        length of the content even for malformed input.
+        
+        Args:
+            content (str): Content to analyze
             
-        return True
+        Returns:
+            int: End position for the search, or 0 if no block can match
+        """
+        last_end = content.rfind(self.end_marker)
+        if last_end < 0 or content.find(self.start_marker, 0, last_end) < 0:
+            return 0
+        return last_end + len(self.end_marker)
     
     def count_blocks(self, content: str) -> int:
         """
         Count the number of import failure blocks in the content.
         
+        Runs in linear time, including on content with unclosed start
+        markers; see _search_limit.
+        
         Args:
             content (str): Content to analyze
             
         Returns:
             int: Number of blocks found
         """
-        matches = re.findall(self.full_pattern, content, flags=re.MULTILINE | re.DOTALL)
-        return len(matches)
+        endpos = self._search_limit(content)
+        if endpos == 0:
+            return 0
+        
+        return sum(1 for _ in self._FULL_RE.finditer(content, 0, endpos))
     
     def clean_file(self, file_path: str, backup: bool = True) -> bool:
         """
         Clean a single file by removing import failure blocks.
         
+        Files of stream_threshold bytes or more are cleaned in chunks, as
+        in clean_file_stream.
+        
         Args:
             file_path (str): Path to the file to clean
             backup (bool): Whether to create a backup before cleaning
             
+        Returns:
+            bool: True if cleaning was successful, False otherwise
+        """
+        return self._clean(file_path, backup, stream=None)
+    
+    def clean_file_stream(self, file_path: str, backup: bool = True) -> bool:
+        """
+        Clean a single file in fixed-size chunks.
+        
+        Memory use is bounded by the chunk size rather than the file size,
+        which makes this suitable for files larger than available RAM. The
+        one exception is a whitespace-only line, which is held in memory
+        until it ends to decide whether it belongs to a run of blank lines.
+        
+        Args:
+            file_path (str): Path to the file to clean
+            backup (bool): Whether to create a backup before cleaning
+            
+        Returns:
+            bool: True if cleaning was successful, False otherwise
+        """
+        return self._clean(file_path, backup, stream=True)
+    
+    def _clean(self, file_path: str, backup: bool, stream: Optional[bool]) -> bool:
+        """
+        Clean a file and report any error.
+        
+        Args:
+            file_path (str): Path to the file to clean
+            backup (bool): Whether to create a backup before cleaning
+            stream (Optional[bool]): Force chunked cleaning on or off; None
+                decides by file size
+            
         Returns:
             bool: True if cleaning was successful, False otherwise
         """
         path = Path(file_path)
         
-        if not self.validate_file(path):
+        try:
+            return self._clean_path(path, backup, stream)
+            
+        except IOError as e:
+            logger.error("IO error while cleaning %s: %s", path, e)
             return False
+        except Exception as e:
+            logger.error("Unexpected error while cleaning %s: %s", path, e)
+            return False
+    
+    def _clean_path(self, path: Path, backup: bool, stream: Optional[bool]) -> bool:
+        """
+        Remove import failure blocks from a file.
         
-        try:
-            # Read the original content
-            logger.info(f"Reading file: {path}")
-            with open(path, 'r', encoding='utf-8', errors='replace') as f:
-                original_content = f.read()
+        The cleaned output is written to a temporary file and then put in
+        place by _install. A symlink is followed, so the file it points to
+        is cleaned and the link itself is left alone.
+        
+        Args:
+            path (Path): Path to the file to clean
+            backup (bool): Whether to create a backup before cleaning
+            stream (Optional[bool]): Force chunked cleaning on or off; None
+                decides by file size
             
-            # Count blocks before cleaning
-            block_count = self.count_blocks(original_content)
+        Returns:
+            bool: True if cleaning was successful, False if the path is not
+            an existing, readable and writable file
+        """
+        st = self._stat_file(path)
+        if st is None:
+            return False
+        
+        # A file smaller than the two markers cannot hold a block, so there
+        # is no need to open it at all; this also keeps empty files away
+        # from mmap, which rejects them
+        size = st.st_size
+        if size < len(self._start_marker_bytes) + len(self._end_marker_bytes):
+            logger.info("File too small to contain an import failure block: %s", path)
+            return True
+        
+        if stream is None:
+            stream = size >= self.stream_threshold
+        
+        # Write the temporary file next to the real file rather than next
+        # to a symlink, so that swapping it in replaces the target
+        target = Path(os.path.realpath(path))
+        
+        logger.info("Reading file: %s", path)
+        src = self._open_for_update(path)
+        if src is None:
+            return False
+        
+        with src:
+            if stream:
+                tmp_name, block_count = self._write_temp(
+                    target, functools.partial(self._stream_remove_blocks, src)
+                )
+            elif size <= self.chunk_size:
+                tmp_name, block_count = self._clean_buffered(src, size, target)
+            else:
+                tmp_name, block_count = self._clean_mapped(src, target)
+        
+        try:
+            # Streaming writes the temporary file before it knows whether
+            # there were any blocks, so it is removed here too
             if block_count == 0:
-                logger.info("No import failure blocks found in file")
+                logger.info("No import failure blocks found in file: %s", path)
                 return True
                 
-            logger.info(f"Found {block_count} import failure block(s)")
+            logger.info("Found %d import failure block(s) in: %s", block_count, path)
             
-            # Create backup if requested
+            # Create backup if requested; copyfile lets the kernel copy the
+            # data without passing it through Python
             if backup:
                 backup_path = path.with_suffix(path.suffix + '.bak')
-                logger.info(f"Creating backup: {backup_path}")
-                with open(backup_path, 'w', encoding='utf-8') as f:
-                    f.write(original_content)
+                logger.info("Creating backup: %s", backup_path)
+                shutil.copyfile(path, backup_path)
             
-            # Clean the content
-            cleaned_content = self.clean_content(original_content)
+            # The original is closed by now, which Windows needs to replace it
+            logger.info("Writing cleaned content to: %s", path)
+            self._install(target, tmp_name, st)
+            tmp_name = None
             
-            # Write cleaned content back to file
-            logger.info(f"Writing cleaned content to: {path}")
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(cleaned_content)
+        finally:
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.remove(tmp_name)
+        
+        logger.info("Successfully cleaned %d import failure block(s) from: %s", block_count, path)
+        return True
+    
+    def _stat_file(self, path: Path) -> Optional[os.stat_result]:
+        """
+        Stat the file to clean, reporting a missing path or a non-file.
+        
+        Problems with the path surface from the stat and open calls that
+        are needed anyway, rather than from separate exists/is_file/access
+        checks that cost extra syscalls and can go stale before the open.
+        
+        Args:
+            path (Path): Path to the file to clean
             
-            logger.info(f"Successfully cleaned {block_count} import failure block(s)")
-            return True
+        Returns:
+            Optional[os.stat_result]: Status of the file, or None if it is
+            not an existing regular file
+        """
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            logger.error("File does not exist: %s", path)
+            return None
+        
+        if not stat.S_ISREG(st.st_mode):
+            logger.error("Path is not a file: %s", path)
+            return None
+        
+        return st
+    
+    def _open_for_update(self, path: Path) -> Optional[BinaryIO]:
+        """
+        Open the file to clean, reporting one that cannot be rewritten.
+        
+        Opening for update rather than just for reading fails up front if
+        the file cannot be rewritten, before any work is done.
+        
+        Args:
+            path (Path): Path to the file to clean
             
-        except UnicodeDecodeError as e:
-            logger.error(f"Unicode decode error: {e}")
-            return False
-        except IOError as e:
-            logger.error(f"IO error: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
-            return False
+        Returns:
+            Optional[BinaryIO]: The file opened for binary reading and
+            writing, or None if permission was denied
+        """
+        try:
+            return open(path, 'r+b')
+        except PermissionError:
+            logger.error("File is not readable/writable: %s", path)
+            return None
     
-    def clean_multiple_files(self, file_paths: List[str], backup: bool = True) -> dict:
+    def _clean_mapped(self, src: BinaryIO, target: Path) -> Tuple[Optional[str], int]:
+        """
+        Clean a file by mapping it into memory.
+        
+        The kernel pages the file in on demand and nothing is decoded or
+        copied up front. The kept slices are written one by one, so the
+        cleaned file is never joined into one large string.
+        
+        Args:
+            src (BinaryIO): The file opened for binary reading
+            target (Path): Real path of the file being cleaned
+            
+        Returns:
+            Tuple[Optional[str], int]: Name of the temporary file holding the
+            cleaned content, or None if no blocks were found, and number of
+            blocks removed
+        """
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            spans = self._find_blocks(content)
+            if not spans:
+                return None, 0
+            
+            return self._write_temp(target, functools.partial(self._write_kept, content, spans, None))
+    
+    def _clean_buffered(self, src: BinaryIO, size: int, target: Path) -> Tuple[Optional[str], int]:
+        """
+        Clean a small file read whole into this thread's reusable buffer.
+        
+        Reading into the buffer is much cheaper than mapping and unmapping
+        a small file. One byte more than the expected size is requested to
+        notice a file that grew since it was stat'ed, rather than silently
+        truncating it.
+        
+        Args:
+            src (BinaryIO): The file opened for binary reading
+            size (int): Size of the file when it was stat'ed
+            target (Path): Real path of the file being cleaned
+            
+        Returns:
+            Tuple[Optional[str], int]: Name of the temporary file holding the
+            cleaned content, or None if no blocks were found, and number of
+            blocks removed
+            
+        Raises:
+            IOError: If the file grew since it was stat'ed
+        """
+        buf = _thread_buffer(size + 1)
+        with memoryview(buf) as view:
+            length = src.readinto(view[:size + 1])
+        if length > size:
+            raise IOError(f"File changed while being read: {target}")
+        
+        spans = self._find_blocks(buf, length)
+        if not spans:
+            return None, 0
+        
+        return self._write_temp(target, functools.partial(self._write_kept, buf, spans, length))
+    
+    def _install(self, target: Path, tmp_name: str, st: os.stat_result) -> None:
+        """
+        Put the cleaned content of a temporary file in place of a file's.
+        
+        The temporary file is normally given the file's mode and, where
+        permitted, its owner and group, then swapped in with os.replace so
+        that a crash part-way through never leaves the file truncated or
+        half-written. A file with other hard links, or whose directory
+        could not hold the temporary file, is instead rewritten in place so
+        that every name for it sees the cleaned content.
+        
+        Args:
+            target (Path): Real path of the file being cleaned
+            tmp_name (str): Temporary file holding the cleaned content
+            st (os.stat_result): Status of the file before cleaning
+        """
+        if st.st_nlink > 1 or Path(tmp_name).parent != target.parent:
+            with open(tmp_name, 'rb') as src, open(target, 'r+b') as dst:
+                shutil.copyfileobj(src, dst, self.chunk_size)
+                dst.truncate()
+            os.remove(tmp_name)
+            return
+        
+        shutil.copymode(target, tmp_name)
+        if hasattr(os, 'chown'):
+            try:
+                os.chown(tmp_name, st.st_uid, st.st_gid)
+            except OSError:
+                # Only root can give a file away; the mode is kept regardless
+                pass
+        os.replace(tmp_name, target)
+    
+    def _write_temp(self, path: Path,
+                    produce: Callable[[Callable[[bytes], object]], int]) -> Tuple[str, int]:
+        """
+        Write cleaned content to a temporary file next to the original.
+        
+        Excess blank lines are collapsed on the way through, so the kept
+        content can be handed over in pieces of any size.
+        
+        Args:
+            path (Path): Path of the file being cleaned
+            produce (Callable): Passes the kept content to the write callable
+                it is given and returns the number of blocks removed
+            
+        Returns:
+            Tuple[str, int]: Name of the temporary file and number of blocks removed
+        """
+        with _temp_file_for(path) as tmp:
+            try:
+                collapser = _BlankLineCollapser(self._collapse_blank_lines, tmp.write)
+                block_count = produce(collapser.write)
+                collapser.flush()
+            except BaseException:
+                tmp.close()
+                os.remove(tmp.name)
+                raise
+        
+        return tmp.name, block_count
+    
+    def _stream_remove_blocks(self, src: BinaryIO, write: Callable[[bytes], object]) -> int:
+        """
+        Copy a file to ``write`` with import failure blocks left out.
+        
+        Matches _find_blocks exactly while holding at most one chunk plus
+        a partial marker in memory. Chunks are read in place into one
+        preallocated bytearray, and the partial marker carried over is moved
+        to its front by slice assignment, so no buffer is allocated per
+        chunk. A start marker that is never closed is copied through from
+        its recorded offset once the end of the file is reached.
+        
+        Args:
+            src (BinaryIO): The file opened for binary reading
+            write (Callable[[bytes], object]): Receives the kept content
+            
+        Returns:
+            int: Number of blocks removed
+        """
+        start_marker, end_marker = self._start_marker_bytes, self._end_marker_bytes
+        block_count = 0
+        inside = False
+        block_offset = 0
+        
+        buf = _thread_buffer(max(len(start_marker), len(end_marker)) - 1 + self.chunk_size)
+        filled = 0
+        buf_offset = 0
+        
+        while True:
+            with memoryview(buf) as view:
+                read = src.readinto(view[filled:filled + self.chunk_size])
+            filled += read
+            
+            pos = 0
+            while True:
+                if not inside:
+                    start = buf.find(start_marker, pos, filled)
+                    if start < 0:
+                        break
+                    write(buf[pos:start])
+                    inside = True
+                    block_offset = buf_offset + start
+                    pos = start + len(start_marker)
+                else:
+                    end = buf.find(end_marker, pos, filled)
+                    if end < 0:
+                        break
+                    inside = False
+                    block_count += 1
+                    pos = end + len(end_marker)
+            
+            if not read:
+                if not inside:
+                    write(buf[pos:filled])
+                break
+            
+            # Carry over enough bytes to catch a marker split across chunks
+            marker = end_marker if inside else start_marker
+            keep = max(pos, filled - len(marker) + 1)
+            if not inside:
+                write(buf[pos:keep])
+            buf[:filled - keep] = buf[keep:filled]
+            filled -= keep
+            buf_offset += keep
+        
+        if inside:
+            # The last block was never closed, so it is not a block at all
+            self._copy_rest(src, block_offset, write)
+        
+        return block_count
+    
+    def _copy_rest(self, src: BinaryIO, offset: int, write: Callable[[bytes], object]) -> None:
+        """
+        Pass a file's content from ``offset`` to its end to ``write``.
+        
+        Args:
+            src (BinaryIO): The file opened for binary reading
+            offset (int): Position to copy from
+            write (Callable[[bytes], object]): Receives the content
+        """
+        src.seek(offset)
+        for chunk in iter(lambda: src.read(self.chunk_size), b""):
+            write(chunk)
+    
+    def clean_multiple_files(self, file_paths: List[str], backup: bool = True,
+                             max_workers: Optional[int] = None, jobs: int = 1) -> dict:
         """
         Clean multiple files and return results.
         
+        Cleaning a file is dominated by reads and writes, which release the
+        GIL, so by default files are processed on a thread pool to overlap
+        their I/O. The cleaner holds no mutable state and is safe to share
+        between threads. For large batches where scanning is CPU-bound,
+        ``jobs`` spreads the files across worker processes instead. Results
+        are reported in the order the files were given.
+        
         Args:
             file_paths (List[str]): List of file paths to clean
             backup (bool): Whether to create backups
+            max_workers (Optional[int]): Number of worker threads; defaults to
+                four per CPU, capped at 32
+            jobs (int): Number of worker processes; 1 uses threads instead
             
         Returns:
             dict: Results summary with success/failure counts
         """
         results = {"success": 0, "failed": 0, "files": []}
         
-        for file_path in file_paths:
-            logger.info(f"Processing file: {file_path}")
-            success = self.clean_file(file_path, backup)
+        if jobs > 1 and len(file_paths) > 1:
+            # Each worker receives a copy of this cleaner once, at startup
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(self, logging.getLogger().level)
+            ) as executor:
+                chunksize = max(1, len(file_paths) // (jobs * 4))
+                outcomes = list(executor.map(
+                    _clean_one, file_paths, itertools.repeat(backup), chunksize=chunksize
+                ))
+        else:
+            if max_workers is None:
+                max_workers = min(32, (os.cpu_count() or 1) * 4)
             
+            def process(file_path: str) -> bool:
+                logger.info("Processing file: %s", file_path)
+                return self.clean_file(file_path, backup)
+            
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = list(executor.map(process, file_paths))
+        
+        for file_path, success in zip(file_paths, outcomes):
             results["files"].append({
                 "path": file_path,
                 "success": success
@@ -200,6 +793,96 @@ class ContentCleaner:
         return results
 
 
+# Cleaner used by each worker process of clean_multiple_files
+_worker_cleaner: Optional[ContentCleaner] = None
+
+
+def _init_worker(cleaner: ContentCleaner, log_level: int) -> None:
+    """Install the parent's cleaner and log level in a worker process."""
+    global _worker_cleaner
+    _worker_cleaner = cleaner
+    logging.getLogger().setLevel(log_level)
+
+
+def _clean_one(file_path: str, backup: bool) -> bool:
+    """Clean one file in a worker process; module-level so it can be pickled."""
+    logger.info("Processing file: %s", file_path)
+    return _worker_cleaner.clean_file(file_path, backup)
+
+
+class _BlankLineCollapser:
+    """
+    Apply a blank-line collapse function to content arriving in chunks.
+    
+    A run of blank lines cannot extend past a non-whitespace byte, so
+    content between the first and last non-whitespace bytes of a chunk can
+    be collapsed on its own. Only the trailing whitespace from its first
+    line break on is held back, in a bytearray that later whitespace is
+    appended to in place. Once it spans three or more line breaks it is
+    collapsed as it grows, so a long stretch of blank lines never
+    accumulates; a single whitespace-only line is held whole until it ends,
+    since whether it is kept depends on what follows it.
+    """
+    
+    def __init__(self, collapse: Callable[[bytes], bytes], write: Callable[[bytes], object]):
+        self._collapse = collapse
+        self._write = write
+        self._pending = bytearray()
+        self._newlines = 0
+    
+    def write(self, data: bytes) -> None:
+        """Collapse and forward everything that cannot join a later run."""
+        start = len(data) - len(data.lstrip())
+        if start == len(data):
+            self._hold(data)
+            return
+        
+        # The first non-whitespace byte ends any run held so far
+        if start:
+            self._hold(data[:start])
+        self.flush()
+        
+        end = len(data.rstrip())
+        self._write(self._collapse(data[start:end]))
+        self._hold(data[end:])
+    
+    def _hold(self, whitespace: bytes) -> None:
+        """Keep trailing whitespace for the next chunk in its shortest equivalent form."""
+        if not self._newlines:
+            # Whitespace before the line break that opens a run, and the
+            # CR that may precede it, is never changed by the collapse.
+            # Without a line break only such a CR can be held.
+            whitespace = self._pending + whitespace
+            self._pending = bytearray()
+            head = whitespace.find(b"\n")
+            if head < 0:
+                head = len(whitespace)
+            if head and whitespace[head - 1:head] == b"\r":
+                head -= 1
+            if head:
+                self._write(whitespace[:head])
+                whitespace = whitespace[head:]
+        
+        self._pending += whitespace
+        self._newlines += whitespace.count(b"\n")
+        
+        # Collapsing a run early gives the same result as collapsing it
+        # whole: it becomes two line breaks, each with the CR that the
+        # first one carried, followed by whatever comes after its last one
+        if self._newlines >= 3:
+            blank = b"\r\n" if self._pending.startswith(b"\r") else b"\n"
+            del self._pending[:self._pending.rfind(b"\n") + 1]
+            self._pending[:0] = blank * 2
+            self._newlines = 2
+    
+    def flush(self) -> None:
+        """Collapse and forward the held-back trailing whitespace."""
+        if self._pending:
+            self._write(self._collapse(self._pending))
+            self._pending = bytearray()
+        self._newlines = 0
+
+
 def setup_argument_parser() -> argparse.ArgumentParser:
     """Set up command line argument parser."""
     parser = argparse.ArgumentParser(
@@ -219,6 +902,15 @@ def setup_argument_parser() -> argparse.ArgumentParser:
         help="Don't create backup files"
     )
     
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Clean multiple files in N worker processes (default: 1, uses threads)"
+    )
+    
     parser.add_argument(
         "--verbose",
         "-v",
@@ -268,6 +960,9 @@ def main():
     parser = setup_argument_parser()
     args = parser.parse_args()
     
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    
     # Set up logging level
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -293,7 +988,7 @@ def main():
         sys.exit(0 if success else 1)
     else:
         # Multiple file processing
-        results = cleaner.clean_multiple_files(file_paths, backup)
+        results = cleaner.clean_multiple_files(file_paths, backup, jobs=args.jobs)
         
         print(f"\n=== Results Summary ===")
         print(f"Successfully processed: {results['success']} files")
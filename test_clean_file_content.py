@@ -0,0 +1,328 @@
+"""Tests for clean_file_content."""
+
+import functools
+import multiprocessing
+import os
+import pickle
+import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import clean_file_content
+from clean_file_content import ContentCleaner
+
+
+BLOCK = b"TEST.IMPORT_FAILURES:\nbad code\nTEST.END_IMPORT_FAILURES:\n"
+DIRTY = b"code\n" + BLOCK + b"\n\nmore code\n"
+CLEANED = b"code\n\nmore code\n"
+
+# The regex implementation that the scanner and collapse must reproduce
+BLOCK_RE = re.compile(rb"(?s)TEST\.IMPORT_FAILURES:.*?TEST\.END_IMPORT_FAILURES:")
+BLANK_RE = re.compile(rb"(\r?)\n\s*\n\s*\n")
+
+# Pieces that random inputs are built from, including partial markers
+TOKENS = [
+    b"TEST.IMPORT_FAILURES:", b"TEST.END_IMPORT_FAILURES:", b"TEST.", b"IMPORT_FAILURES:",
+    b"\n", b"\r\n", b"\r", b" ", b"\t", b"code", b"\xff", b"\n  \n",
+]
+
+
+def reference_clean(content: bytes) -> bytes:
+    """Clean content the way the original regex implementation does."""
+    cleaned, block_count = BLOCK_RE.subn(b"", content)
+    if block_count == 0:
+        return content
+    return BLANK_RE.sub(rb"\1\n\1\n", cleaned)
+
+
+def random_inputs(count: int, max_tokens: int = 60):
+    """Yield reproducible random file contents built from TOKENS."""
+    rng = random.Random(1234)
+    for _ in range(count):
+        yield b"".join(rng.choice(TOKENS) for _ in range(rng.randint(0, max_tokens)))
+
+
+def make_cleaner(mode: str, chunk_size: int) -> ContentCleaner:
+    """Return a cleaner forced onto one of its read paths."""
+    cleaner = ContentCleaner()
+    if mode == "buffer":
+        # Every test file fits in a single chunk
+        cleaner.chunk_size = 1024 * 1024
+    else:
+        # Test files are larger than a chunk, so they are mapped or streamed
+        cleaner.chunk_size = chunk_size
+        if mode == "stream":
+            cleaner.stream_threshold = 0
+    return cleaner
+
+
+@pytest.fixture(params=["clean_file", "clean_file_stream"])
+def clean(request):
+    """Clean a file with each cleaning entry point in turn."""
+    return getattr(ContentCleaner(), request.param)
+
+
+def test_symlink_target_is_cleaned(tmp_path, clean):
+    target = tmp_path / "real" / "t.c"
+    target.parent.mkdir()
+    target.write_bytes(DIRTY)
+    link = tmp_path / "link.c"
+    link.symlink_to(target)
+
+    assert clean(str(link), backup=False)
+
+    assert link.is_symlink()
+    assert target.read_bytes() == CLEANED
+
+
+def test_hard_links_are_kept(tmp_path, clean):
+    first = tmp_path / "h1.c"
+    first.write_bytes(DIRTY)
+    second = tmp_path / "h2.c"
+    os.link(first, second)
+
+    assert clean(str(first), backup=False)
+
+    assert os.stat(second).st_nlink == 2
+    assert second.read_bytes() == CLEANED
+
+
+@pytest.mark.parametrize("mode, chunk_size", [
+    ("buffer", None),
+    ("mmap", 1),
+    ("stream", 1),
+    ("stream", 2),
+    ("stream", 7),
+    ("stream", 25),
+    ("stream", 64),
+])
+def test_matches_regex_reference(tmp_path, mode, chunk_size):
+    cleaner = make_cleaner(mode, chunk_size)
+    path = tmp_path / "t.c"
+    for content in random_inputs(500):
+        path.write_bytes(content)
+
+        assert cleaner.clean_file(str(path), backup=False)
+
+        assert path.read_bytes() == reference_clean(content), content
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7])
+@pytest.mark.parametrize("tail", [
+    b"x\n" + b" " * 5000 + b"y\n",
+    b"x\r\n" + b" \t" * 2500 + b"\r\n" + b" " * 5000 + b"\n\ny\r\n",
+    b"x\n" + b"  \n" * 3000 + b" " * 5000,
+], ids=["blank-line", "crlf-blank-lines", "blank-run"])
+def test_long_whitespace_spans_many_chunks(tmp_path, chunk_size, tail):
+    content = b"code\n" + BLOCK + tail
+    path = tmp_path / "t.c"
+    path.write_bytes(content)
+
+    assert make_cleaner("stream", chunk_size).clean_file(str(path), backup=False)
+
+    assert path.read_bytes() == reference_clean(content)
+
+
+@pytest.mark.parametrize("mode", ["buffer", "mmap", "stream"])
+def test_crlf_line_endings_are_kept(tmp_path, mode):
+    path = tmp_path / "t.c"
+    path.write_bytes(
+        b"code\r\nTEST.IMPORT_FAILURES:\r\nbad\r\nTEST.END_IMPORT_FAILURES:\r\n\r\n\r\nmore\r\n"
+    )
+
+    assert make_cleaner(mode, 3).clean_file(str(path), backup=False)
+
+    assert path.read_bytes() == b"code\r\n\r\nmore\r\n"
+
+
+@pytest.mark.parametrize("mode", ["buffer", "mmap", "stream"])
+def test_unclosed_start_marker_is_kept(tmp_path, mode):
+    content = b"code\n" + BLOCK + b"keep\nTEST.IMPORT_FAILURES:\nnever closed\n\n\n\nend\n"
+    path = tmp_path / "t.c"
+    path.write_bytes(content)
+
+    assert make_cleaner(mode, 3).clean_file(str(path), backup=False)
+
+    assert path.read_bytes() == b"code\n\nkeep\nTEST.IMPORT_FAILURES:\nnever closed\n\nend\n"
+
+
+@pytest.mark.parametrize("mode", ["buffer", "mmap", "stream"])
+def test_file_without_blocks_is_left_alone(tmp_path, mode):
+    content = b"code\n\n\n\nTEST.IMPORT_FAILURES: never closed\n"
+    path = tmp_path / "t.c"
+    path.write_bytes(content)
+
+    assert make_cleaner(mode, 3).clean_file(str(path))
+
+    assert path.read_bytes() == content
+    assert os.listdir(tmp_path) == ["t.c"]
+
+
+def test_too_small_file_is_left_alone(tmp_path):
+    content = b"TEST.IMPORT_FAILURES:TEST.END_IMPORT_FAILURE"
+    path = tmp_path / "t.c"
+    path.write_bytes(content)
+
+    assert ContentCleaner().clean_file(str(path))
+
+    assert path.read_bytes() == content
+    assert not (tmp_path / "t.c.bak").exists()
+
+
+def test_file_growing_while_read_fails(tmp_path, monkeypatch):
+    path = tmp_path / "t.c"
+    path.write_bytes(DIRTY)
+    thread_buffer = clean_file_content._thread_buffer
+
+    def grow_then_buffer(size):
+        # Runs between the stat and the read, as a concurrent writer could
+        with open(path, "ab") as f:
+            f.write(b"appended\n")
+        return thread_buffer(size)
+
+    monkeypatch.setattr(clean_file_content, "_thread_buffer", grow_then_buffer)
+
+    assert not ContentCleaner().clean_file(str(path))
+
+    assert path.read_bytes() == DIRTY + b"appended\n"
+    assert os.listdir(tmp_path) == ["t.c"]
+
+
+def test_backup_holds_original(tmp_path):
+    path = tmp_path / "t.c"
+    path.write_bytes(DIRTY)
+
+    assert ContentCleaner().clean_file(str(path))
+
+    assert path.read_bytes() == CLEANED
+    assert (tmp_path / "t.c.bak").read_bytes() == DIRTY
+
+
+def test_missing_file_fails(tmp_path):
+    assert not ContentCleaner().clean_file(str(tmp_path / "missing.c"))
+
+
+def test_directory_fails(tmp_path):
+    assert not ContentCleaner().clean_file(str(tmp_path))
+
+
+def test_collapse_blank_lines_matches_regex():
+    cleaner = ContentCleaner()
+    for content in random_inputs(2000, max_tokens=30):
+        expected = BLANK_RE.sub(rb"\1\n\1\n", content)
+
+        assert cleaner._collapse_blank_lines(content) == expected, content
+        text = content.decode("latin-1")
+        assert cleaner._collapse_blank_lines(text) == expected.decode("latin-1"), content
+
+
+def test_clean_content():
+    content = "some code\nTEST.IMPORT_FAILURES:\nbad code\nTEST.END_IMPORT_FAILURES:\n\n  \n\nmore code"
+
+    assert ContentCleaner().clean_content(content) == "some code\n\nmore code"
+
+
+def test_clean_content_without_blocks_is_unchanged():
+    content = "some code\n\n\n\nmore code"
+
+    assert ContentCleaner().clean_content(content) == content
+
+
+def make_batch(tmp_path):
+    """Write files of varied sizes, largest first, and return their paths with a missing one."""
+    contents = [
+        b"long line of code\n" * 200 + DIRTY + BLOCK + b"\n\n\nend\n",
+        b"no blocks, just code\n" * 10,
+        DIRTY,
+        b"x",
+        b"code\r\n" + BLOCK.replace(b"\n", b"\r\n") + b"\r\n\r\n\r\nmore\r\n",
+    ]
+    paths = []
+    for index, content in enumerate(contents):
+        path = tmp_path / f"f{index}.c"
+        path.write_bytes(content)
+        paths.append(str(path))
+    paths.insert(2, str(tmp_path / "missing.c"))
+    return paths, contents
+
+
+def check_batch(results, paths, contents):
+    """Check the results and cleaned files of a batch from make_batch."""
+    assert [entry["path"] for entry in results["files"]] == paths
+    assert [entry["success"] for entry in results["files"]] == [True, True, False, True, True, True]
+    assert results["success"] == 5
+    assert results["failed"] == 1
+    for path, content in zip(paths[:2] + paths[3:], contents):
+        assert open(path, "rb").read() == reference_clean(content), path
+
+
+@pytest.mark.parametrize("start_method", [None, "spawn"])
+def test_clean_multiple_files_in_processes(tmp_path, monkeypatch, start_method):
+    if start_method is not None:
+        # Spawned workers receive the cleaner by pickling it
+        context = multiprocessing.get_context(start_method)
+        monkeypatch.setattr(
+            clean_file_content, "ProcessPoolExecutor",
+            functools.partial(ProcessPoolExecutor, mp_context=context),
+        )
+    paths, contents = make_batch(tmp_path)
+
+    results = ContentCleaner().clean_multiple_files(paths, backup=False, jobs=2)
+
+    check_batch(results, paths, contents)
+
+
+def test_cleaner_pickles_with_its_settings():
+    cleaner = ContentCleaner()
+    cleaner.chunk_size = 7
+    cleaner.stream_threshold = 0
+
+    copy = pickle.loads(pickle.dumps(cleaner))
+
+    assert copy.chunk_size == 7
+    assert copy.stream_threshold == 0
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_clean_multiple_files_in_threads(tmp_path, max_workers):
+    # With one worker every file reuses the same thread's read buffer, and
+    # the largest file comes first so stale bytes would follow smaller ones
+    paths, contents = make_batch(tmp_path)
+
+    results = ContentCleaner().clean_multiple_files(paths, backup=False, max_workers=max_workers)
+
+    check_batch(results, paths, contents)
+
+
+@pytest.fixture(params=["re", "re2"])
+def block_regex(request, monkeypatch):
+    """Count blocks with each regex engine in turn; RE2 only if installed."""
+    engine = pytest.importorskip(request.param)
+    monkeypatch.setattr(ContentCleaner, "_FULL_RE", engine.compile(ContentCleaner.full_pattern))
+
+
+def test_count_blocks_matches_findall(block_regex):
+    cleaner = ContentCleaner()
+    start, end = ContentCleaner.start_marker, ContentCleaner.end_marker
+    contents = [content.decode("latin-1") for content in random_inputs(2000)]
+    contents += [
+        "",
+        start,
+        end + start,
+        start + "a" + start + "b" + end + start,
+        start + end + start + "\n" + start + "never closed",
+    ]
+    for content in contents:
+        assert cleaner.count_blocks(content) == len(re.findall(ContentCleaner.full_pattern, content)), content
+
+
+def test_count_blocks_with_many_unclosed_markers_is_fast(block_regex):
+    # Scanning to the end for every unclosed marker takes tens of seconds here
+    content = "code\n" + BLOCK.decode() + "TEST.IMPORT_FAILURES:\n" * 20000
+
+    started = time.perf_counter()
+    assert ContentCleaner().count_blocks(content) == 1
+    assert time.perf_counter() - started < 1